@@ -1,8 +1,15 @@
+import json
+import os
 import re
 import sys
-from typing import List, Tuple, Dict
+from typing import List, Tuple, Dict, Optional
 
-from Distancia import Frame, leer_videos
+import numpy
+from scipy.ndimage import maximum_filter1d
+
+from Checkpoint import leer_checkpoint, guardar_checkpoint, abrir_salida, sincronizar, huella_archivo, \
+    salidas_validas, fusionar_con_checkpoint
+from Distancia import Frame, leer_videos, tipo_cercanos
 
 
 class Cercanos:
@@ -11,10 +18,26 @@ class Cercanos:
         self.frames = frames
 
 
+def leer_cercanos_binario(archivo: str) -> Tuple[numpy.ndarray, List[str]]:
+    """
+    Lee un log binario de frames cercanos, junto a su cabecera json con los nombres de los comerciales.
+
+    :param archivo: nombre del archivo binario.
+
+    :return: un arreglo con una fila por frame (ver tipo_cercanos) y la lista de nombres de los comerciales.
+    """
+    with open(f'{os.path.splitext(archivo)[0]}.json', 'r') as cabecera:
+        datos = json.load(cabecera)
+
+    return numpy.fromfile(archivo, dtype=tipo_cercanos(datos['k'])), datos['comerciales']
+
+
 def leer_cercanos(archivo: str) -> List[Cercanos]:
     """
-    Lee un archivo que contiene los frames más cercanos a cada frame de un video. Cada linea debe tener el siguiente
-    formato: 'tiempo $ comercial # indice | comercial # indice | ...'.
+    Lee un archivo que contiene los frames más cercanos a cada frame de un video. Puede ser un log binario (.bin) o
+    un log txt, donde cada linea debe tener el siguiente formato:
+    'tiempo $ comercial # indice # distancia | comercial # indice # distancia | ...'. La distancia es opcional
+    (logs antiguos), en cuyo caso se deja en 0.
 
     :param archivo: nombre del archivo que contiene la información
 
@@ -22,6 +45,18 @@ def leer_cercanos(archivo: str) -> List[Cercanos]:
     """
     cercanos = []
 
+    if archivo.endswith('.bin'):
+        filas, nombres = leer_cercanos_binario(archivo)
+        nombres = nombres + ['']  # el id -1 corresponde a un frame vacío
+
+        for tiempo, comerciales, indices, distancias in zip(filas['tiempo'].tolist(), filas['comercial'].tolist(),
+                                                            filas['indice'].tolist(), filas['distancia'].tolist()):
+            frames = [Frame(comercial=nombres[c], indice=i, distancia=d)
+                      for c, i, d in zip(comerciales, indices, distancias)]
+            cercanos.append(Cercanos(frames=frames, tiempo=tiempo))
+
+        return cercanos
+
     with open(archivo, 'r') as log:
         for linea in log:
             # separar tiempo de los frames.
@@ -34,8 +69,9 @@ def leer_cercanos(archivo: str) -> List[Cercanos]:
             # parsear frames.
             frames = []
             for dato in datos:
-                comercial, indice = dato.split(' # ')
-                frames.append(Frame(comercial=comercial, indice=int(indice), distancia=0))
+                partes = dato.split(' # ')
+                distancia = float(partes[2]) if len(partes) == 3 else 0
+                frames.append(Frame(comercial=partes[0], indice=int(partes[1]), distancia=distancia))
 
             # agregar linea parseada a la lista
             cercanos.append(Cercanos(frames=frames, tiempo=tiempo))
@@ -85,6 +121,27 @@ def buscar_inicio(frames: List[Frame], maximo_inicial: int = 2) -> Tuple[int, st
     return indice, comercial
 
 
+def buscar_frame(comercial: str, indice: int, frames: List[Frame], rango: int = 1) -> Optional[Frame]:
+    """
+    Busca un índice para un comercial en una lista de cercanos y retorna el frame más cercano que coincide. Acepta
+    cualquier indice dentro de [indice - rango, indice + rango].
+
+    :param comercial: nombre del comercial a buscar.
+    :param indice: índice a buscar.
+    :param frames: lista de frames en la que buscar (ordenada por distancia).
+    :param rango: rango de flexibilidad para buscar el frame
+
+    :return: el Frame encontrado, None si no se encuentra.
+    """
+
+    for frame in frames:
+        if comercial == frame.comercial and (frame.indice - rango) <= indice <= (frame.indice + rango):
+            return frame
+
+    # indice no encontrado.
+    return None
+
+
 def buscar_indice(comercial: str, indice: int, frames: List[Frame], rango: int = 1) -> bool:
     """
     Busca un índice para un comercial en una lista de cercanos. Acepta cualquier indice dentro
@@ -97,30 +154,64 @@ def buscar_indice(comercial: str, indice: int, frames: List[Frame], rango: int =
 
     :return: True si encuentra el frame, False si no.
     """
+    return buscar_frame(comercial, indice, frames, rango) is not None
 
-    for frame in frames:
-        if comercial == frame.comercial and (frame.indice - rango) <= indice <= (frame.indice + rango):
-            return True
 
-    # indice no encontrado.
-    return False
+def confianza_frame(frame: Optional[Frame], frames: List[Frame]) -> float:
+    """
+    Calcula la confianza de una coincidencia, comparando su distancia con la del cercano más próximo de otro
+    comercial: 1 si es idéntico o si todos los cercanos son de su comercial, 0 si otro comercial está igual de cerca
+    o si no hay coincidencia. No se compara con cercanos del mismo comercial, ya que en escenas estáticas estos están
+    tan cerca como la coincidencia.
+
+    :param frame: el Frame que coincide, None si no hubo coincidencia.
+    :param frames: lista de frames cercanos (ordenada por distancia).
+
+    :return: la confianza, entre 0 y 1.
+    """
+    if frame is None:
+        return 0
+
+    # ignorar frames vacíos al buscar la distancia de referencia.
+    otros = [f.distancia for f in frames if f.indice != -1 and f.comercial != frame.comercial]
+    if len(otros) == 0:
+        return 1
+
+    referencia = min(otros)
+    if referencia <= 0:
+        return 0
+
+    return max(0.0, 1 - frame.distancia / referencia)
 
 
 class Candidato:
-    def __init__(self, nombre: str, indice: int, tiempo_inicio: float):
+    def __init__(self, nombre: str, indice: int, tiempo_inicio: float, errores: int = 0, puntaje: float = 0):
         self.nombre = nombre
         self.indice = indice
         self.tiempo_inicio = tiempo_inicio
-        self.errores = 0
+        self.errores = errores
+        self.puntaje = puntaje
 
 
-def buscar_comerciales(archivo: str, max_porc_error: float = 0.2):
+def buscar_comerciales(archivo: str, max_porc_error: float = 0.2, tamano_bloque: int = 1000,
+                       min_confianza: float = None):
     """
     Busca comerciales en un archivo que contiene los k frames más cercanos a cada frame de un video y los registra en
     un archivo 'respuesta.txt'
 
+    Opcionalmente, cada candidato acumula la confianza de sus coincidencias (ver confianza_frame). Un candidato se
+    descarta apenas su confianza final no puede alcanzar min_confianza aunque todos sus frames restantes coincidan
+    perfectamente, y cada detección se registra con su confianza en una quinta columna.
+
+    Las detecciones se escriben primero en un archivo parcial propio del video, y al terminar se agregan a
+    'respuesta.txt'. Cada cierto número de frames se guarda un checkpoint con los candidatos y lo escrito en el
+    parcial. Si el proceso se interrumpe, al volver a ejecutarlo se reanuda desde el último checkpoint sin duplicar
+    detecciones ni tocar lo que otras ejecuciones hayan agregado a 'respuesta.txt'.
+
     :param archivo: la ubicación del archivo.
     :param max_porc_error: máximo porcentaje de error que puede haber en una detección.
+    :param tamano_bloque: número de frames procesados entre cada checkpoint.
+    :param min_confianza: confianza promedio mínima de una detección, None para no usar confianza.
     """
 
     # nombre del video
@@ -133,14 +224,43 @@ def buscar_comerciales(archivo: str, max_porc_error: float = 0.2):
     # leer comerciales para encontrar su frame final.
     numero_frames = contar_frames_comerciales()
 
+    # reanudar desde el último checkpoint, si existe y corresponde a la misma configuración
+    ruta_checkpoint = f'{os.path.splitext(archivo)[0]}.busqueda.checkpoint'
+    ruta_parcial = f'{os.path.splitext(archivo)[0]}.respuesta.parcial'
+    parametros = {'entrada': huella_archivo(archivo), 'max_porc_error': max_porc_error,
+                  'min_confianza': min_confianza, 'tamano_bloque': tamano_bloque, 'comerciales': numero_frames}
+    estado = leer_checkpoint(ruta_checkpoint, parametros)
+
+    # la búsqueda había terminado y se interrumpió al agregar el parcial a respuesta.txt
+    if estado is not None and estado.get('fusion', False):
+        print('terminando de agregar las detecciones a respuesta.txt')
+        fusionar_con_checkpoint(ruta_checkpoint, estado, ruta_parcial, 'respuesta.txt')
+        print(f'se encontraron {estado["encontrados"]} comerciales')
+        return
+
+    # si el parcial no contiene lo guardado en el checkpoint hay que comenzar de nuevo
+    if estado is not None and not salidas_validas(estado['offsets']):
+        print('el archivo parcial no corresponde al checkpoint, se comienza desde el principio')
+        estado = None
+
+    if estado is None:
+        estado = {'frame': 0, 'offsets': {ruta_parcial: None}, 'candidatos': [], 'encontrados': 0, 'vivos': 0}
+    else:
+        print(f'reanudando desde el frame {estado["frame"]}')
+
+    # abrir log parcial
+    log = abrir_salida(ruta_parcial, estado['offsets'][ruta_parcial])
+
     # lista de candidatos para buscar comerciales
-    candidatos = []
+    candidatos = [Candidato(**candidato) for candidato in estado['candidatos']]
+    encontrados = estado['encontrados']
 
-    # abrir log
-    log = open('respuesta.txt', 'a')
-    encontrados = 0
+    # suma de candidatos vivos en cada frame, para medir el trabajo de seguimiento
+    vivos = estado['vivos']
 
-    for cercanos in lista_cercanos:
+    for i in range(estado['frame'], len(lista_cercanos)):
+        cercanos = lista_cercanos[i]
+        vivos += len(candidatos)
 
         # se tiene una lista de comerciales para eliminar (especificos) y comerciales completados para eliminar todos
         # los que coincidan en el nombre (general)
@@ -155,8 +275,11 @@ def buscar_comerciales(archivo: str, max_porc_error: float = 0.2):
 
                 # registrar comercial.
                 duracion = cercanos.tiempo - cand.tiempo_inicio
-                log.write(f'{nombre_video}\t{"%.1f" % cand.tiempo_inicio}\t{"%.1f" % duracion}\t{cand.nombre}\n')
-                print(f'{nombre_video}\t{"%.1f" % cand.tiempo_inicio}\t{"%.1f" % duracion}\t{cand.nombre}')
+                deteccion = f'{nombre_video}\t{"%.1f" % cand.tiempo_inicio}\t{"%.1f" % duracion}\t{cand.nombre}'
+                if min_confianza is not None:
+                    deteccion += f'\t{"%.3f" % (cand.puntaje / numero_frames[cand.nombre])}'
+                log.write(f'{deteccion}\n')
+                print(deteccion)
                 encontrados += 1
 
                 # eliminar de la lista (después del for).
@@ -166,14 +289,22 @@ def buscar_comerciales(archivo: str, max_porc_error: float = 0.2):
             else:
                 cand.indice += 1
 
-                # buscar siguiente frame y contar errores.
-                if not buscar_indice(cand.nombre, cand.indice, cercanos.frames):
+                # buscar siguiente frame, contar errores y acumular confianza.
+                frame = buscar_frame(cand.nombre, cand.indice, cercanos.frames)
+                if frame is None:
                     cand.errores += 1
+                cand.puntaje += confianza_frame(frame, cercanos.frames)
 
                 # determinar error de detección y eliminar de la lista (después del loop).
                 if cand.errores >= max_porc_error * numero_frames[cand.nombre]:
                     eliminados.append(cand)
 
+                # descartar si ni con coincidencias perfectas en los frames restantes alcanza la confianza mínima.
+                elif min_confianza is not None:
+                    restantes = numero_frames[cand.nombre] - 1 - cand.indice
+                    if cand.puntaje + restantes < min_confianza * numero_frames[cand.nombre]:
+                        eliminados.append(cand)
+
         # eliminar comerciales
         for eliminado in eliminados:
             candidatos.remove(eliminado)
@@ -188,17 +319,216 @@ def buscar_comerciales(archivo: str, max_porc_error: float = 0.2):
         # buscar candidatos.
         indice, nombre = buscar_inicio(cercanos.frames, maximo_inicial=1)
         if indice != -1:
-            candidatos.append(Candidato(nombre, indice, cercanos.tiempo))
-
-    # cerrar log
+            frame = buscar_frame(nombre, indice, cercanos.frames, rango=0)
+            candidatos.append(Candidato(nombre, indice, cercanos.tiempo,
+                                        puntaje=confianza_frame(frame, cercanos.frames)))
+
+        # guardar checkpoint al final de cada bloque
+        if (i + 1) % tamano_bloque == 0:
+            offset = sincronizar(log)
+            guardar_checkpoint(ruta_checkpoint, {'frame': i + 1, 'offsets': {ruta_parcial: offset},
+                                                 'candidatos': [vars(cand) for cand in candidatos],
+                                                 'encontrados': encontrados, 'vivos': vivos,
+                                                 'parametros': parametros})
+
+    # cerrar log parcial y agregarlo a respuesta.txt
+    offset = sincronizar(log)
     log.close()
+    fusionar_con_checkpoint(ruta_checkpoint, {'frame': len(lista_cercanos), 'offsets': {ruta_parcial: offset},
+                                              'candidatos': [], 'encontrados': encontrados, 'vivos': vivos,
+                                              'parametros': parametros}, ruta_parcial, 'respuesta.txt')
     print(f'se encontraron {encontrados} comerciales')
+    if len(lista_cercanos) > 0:
+        print(f'candidatos vivos por frame: {"%.2f" % (vivos / len(lista_cercanos))}')
 
     return
 
 
-def main(archivo: str, max_porc_error: float = 0.2):
-    buscar_comerciales(f'television_cercanos/{archivo}.txt', max_porc_error)
+def matriz_cercanos(archivo: str, nombres: List[str]) -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+    """
+    Lee un archivo de frames cercanos como matrices de n frames x k cercanos.
+
+    :param archivo: nombre del archivo que contiene la información (.bin o txt).
+    :param nombres: nombres de los comerciales, que definen el id de cada comercial.
+
+    :return: el tiempo de cada frame, la matriz de ids de comercial (-1 si no hay) y la matriz de índices.
+    """
+    ids = {nombre: i for i, nombre in enumerate(nombres)}
+
+    if archivo.endswith('.bin'):
+        filas, nombres_archivo = leer_cercanos_binario(archivo)
+
+        # traducir ids del archivo a ids de nombres, el id -1 toma el último elemento (también -1).
+        traduccion = numpy.array([ids.get(nombre, -1) for nombre in nombres_archivo] + [-1])
+        return filas['tiempo'], traduccion[filas['comercial']], filas['indice']
+
+    lista_cercanos = leer_cercanos(archivo)
+    tiempo_tv = numpy.array([cercanos.tiempo for cercanos in lista_cercanos])
+    comercial = numpy.array([[ids.get(frame.comercial, -1) for frame in cercanos.frames]
+                             for cercanos in lista_cercanos])
+    indice = numpy.array([[frame.indice for frame in cercanos.frames] for cercanos in lista_cercanos])
+
+    return tiempo_tv, comercial, indice
+
+
+def votar_desfases(tiempo_tv: numpy.ndarray, comercial: numpy.ndarray, indice: numpy.ndarray,
+                   tiempos: List[List[float]],
+                   resolucion: float) -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray, numpy.ndarray, int]:
+    """
+    Cada frame cercano vota por el desfase 'tiempo_television - tiempo_comercial' de su comercial.
+
+    :param tiempo_tv: tiempo de cada frame de televisión.
+    :param comercial: matriz de n frames x k cercanos con el id del comercial de cada cercano (-1 si no hay).
+    :param indice: matriz de n frames x k cercanos con el índice de cada cercano en su comercial.
+    :param tiempos: tiempos de los frames de cada comercial.
+    :param resolucion: ancho en segundos de cada intervalo del histograma de desfases.
+
+    :return: para cada voto, la llave 'comercial * numero_intervalos + intervalo', el frame de televisión, el índice
+        del frame del comercial y el desfase exacto, ordenados por llave. Además el número de intervalos.
+    """
+
+    # tiempos de todos los comerciales concatenados, con la posición donde comienza cada uno.
+    inicio = numpy.cumsum([0] + [len(t) for t in tiempos])
+    tiempo_comerciales = numpy.concatenate([numpy.array(t, dtype=numpy.float64) for t in tiempos])
+
+    fila = numpy.broadcast_to(numpy.arange(len(tiempo_tv))[:, None], comercial.shape)
+
+    # descartar frames vacíos y calcular desfases.
+    validos = comercial >= 0
+    comercial, indice, fila = comercial[validos], indice[validos], fila[validos]
+    tiempo_tv = numpy.broadcast_to(tiempo_tv[:, None], validos.shape)[validos]
+    desfase = tiempo_tv - tiempo_comerciales[inicio[comercial] + indice]
+
+    positivos = desfase >= 0
+    comercial, indice, fila, desfase = comercial[positivos], indice[positivos], fila[positivos], desfase[positivos]
+    intervalo = (desfase / resolucion).astype(numpy.int64)
+
+    numero_intervalos = int(intervalo.max()) + 2 if len(intervalo) > 0 else 1
+    llave = comercial * numero_intervalos + intervalo
+
+    orden = numpy.argsort(llave, kind='stable')
+    return llave[orden], fila[orden], indice[orden], desfase[orden], numero_intervalos
+
+
+def contar_distintos(llave: numpy.ndarray, valor: numpy.ndarray, total: int) -> numpy.ndarray:
+    """
+    Cuenta cuántos valores distintos tiene cada llave.
+
+    :param llave: arreglo de llaves enteras entre 0 y total - 1.
+    :param valor: arreglo de valores enteros no negativos, del mismo largo que llave.
+    :param total: número de llaves posibles.
+
+    :return: un arreglo de largo total con el número de valores distintos de cada llave.
+    """
+    pares = numpy.unique(llave * (int(valor.max()) + 1) + valor)
+    return numpy.bincount(pares // (int(valor.max()) + 1), minlength=total)
+
+
+def buscar_comerciales_votacion(archivo: str, min_porc_votos: float = 0.3, resolucion: float = 0.5):
+    """
+    Busca comerciales usando votación de desfases (estilo Hough) sobre la matriz completa de cercanos, en vez de
+    seguir candidatos frame a frame. Cada aparición de un comercial concentra votos en un mismo desfase
+    'tiempo_television - tiempo_comercial', por lo que los máximos del histograma de cada comercial son detecciones.
+    Al usar tiempos en vez de índices, tolera diferencias de fps o de salto de frames entre televisión y comerciales.
+    Las detecciones se registran en un archivo 'respuesta.txt', con el porcentaje de votos del pico en una quinta
+    columna. Al igual que en buscar_comerciales, se escriben primero en un archivo parcial propio del video.
+
+    :param archivo: la ubicación del archivo que contiene los k frames más cercanos a cada frame del video.
+    :param min_porc_votos: porcentaje mínimo de frames del comercial que deben votar por un desfase.
+    :param resolucion: ancho en segundos de cada intervalo del histograma de desfases.
+    """
+
+    # nombre del video
+    nombre_video = re.split('[/.]', archivo)[-2]
+    print(f'buscando comerciales en {nombre_video} (votación)')
+
+    # leer cercanos del video y tiempos de los comerciales.
+    comerciales = leer_videos('comerciales_car')
+    nombres = [c.nombre for c in comerciales]
+    tiempo_tv, comercial, indice = matriz_cercanos(archivo, nombres)
+    numero_frames = numpy.array([len(c.frames) for c in comerciales])
+
+    # terminar de agregar las detecciones a respuesta.txt, si una ejecución anterior se interrumpió al hacerlo
+    ruta_checkpoint = f'{os.path.splitext(archivo)[0]}.votacion.checkpoint'
+    ruta_parcial = f'{os.path.splitext(archivo)[0]}.votacion.parcial'
+    parametros = {'entrada': huella_archivo(archivo), 'min_porc_votos': min_porc_votos, 'resolucion': resolucion,
+                  'comerciales': [[c.nombre, len(c.frames)] for c in comerciales]}
+    estado = leer_checkpoint(ruta_checkpoint, parametros)
+    if estado is not None:
+        print('terminando de agregar las detecciones a respuesta.txt')
+        fusionar_con_checkpoint(ruta_checkpoint, estado, ruta_parcial, 'respuesta.txt')
+        print(f'se encontraron {estado["encontrados"]} comerciales')
+        return
+
+    # el primer frame extraído está a un salto del inicio, por lo que la duración suma ese salto.
+    duraciones = numpy.array([c.tiempo[-1] + c.tiempo[0] for c in comerciales])
+
+    llaves, fila, indice, desfase, numero_intervalos = votar_desfases(tiempo_tv, comercial, indice,
+                                                                      [c.tiempo for c in comerciales], resolucion)
+    if len(desfase) == 0:
+        print('se encontraron 0 comerciales')
+        return
+
+    # histograma por comercial, juntando cada intervalo con el siguiente para desfases que caen en el borde. Un
+    # desfase solo recibe tantos votos como frames distintos de televisión y de comercial lo apoyan, para que las
+    # escenas estáticas (un frame repetido que coincide con pocos frames del comercial) no acumulen votos.
+    vecinos = llaves % numero_intervalos > 0
+    ventana_llaves = numpy.concatenate([llaves, llaves[vecinos] - 1])
+    ventana_filas = numpy.concatenate([fila, fila[vecinos]])
+    ventana_indices = numpy.concatenate([indice, indice[vecinos]])
+
+    total = len(nombres) * numero_intervalos
+    votos = numpy.minimum(contar_distintos(ventana_llaves, ventana_filas, total),
+                          contar_distintos(ventana_llaves, ventana_indices, total))
+    puntaje = votos.reshape(len(nombres), numero_intervalos) / numero_frames[:, None]
+
+    # máximos locales dentro de la duración de cada comercial.
+    picos = numpy.zeros(puntaje.shape, dtype=bool)
+    for c in range(len(nombres)):
+        ventana = 2 * int(duraciones[c] / resolucion) + 1
+        picos[c] = (puntaje[c] >= min_porc_votos) & (puntaje[c] == maximum_filter1d(puntaje[c], ventana))
+
+    # refinar el inicio con la mediana de los desfases que votaron por cada pico.
+    detecciones = []
+    for c, b in zip(*numpy.nonzero(picos)):
+        desde = numpy.searchsorted(llaves, c * numero_intervalos + b, side='left')
+        hasta = numpy.searchsorted(llaves, c * numero_intervalos + b + 1, side='right')
+        detecciones.append((puntaje[c, b], float(numpy.median(desfase[desde:hasta])), duraciones[c], nombres[c]))
+
+    # eliminar detecciones que se traslapan con otra de mayor puntaje.
+    aceptadas = []
+    for score, inicio, duracion, nombre in sorted(detecciones, key=lambda d: -d[0]):
+        traslapada = False
+        for _, inicio_2, duracion_2, _ in aceptadas:
+            traslape = min(inicio + duracion, inicio_2 + duracion_2) - max(inicio, inicio_2)
+            if traslape > 0.5 * min(duracion, duracion_2):
+                traslapada = True
+                break
+        if not traslapada:
+            aceptadas.append((score, inicio, duracion, nombre))
+
+    # registrar comerciales en orden temporal, en el log parcial y luego en respuesta.txt.
+    log = open(ruta_parcial, 'w')
+    for score, inicio, duracion, nombre in sorted(aceptadas, key=lambda d: d[1]):
+        deteccion = f'{nombre_video}\t{"%.1f" % inicio}\t{"%.1f" % duracion}\t{nombre}\t{"%.3f" % score}'
+        log.write(f'{deteccion}\n')
+        print(deteccion)
+
+    sincronizar(log)
+    log.close()
+    fusionar_con_checkpoint(ruta_checkpoint, {'encontrados': len(aceptadas), 'parametros': parametros}, ruta_parcial,
+                            'respuesta.txt')
+    print(f'se encontraron {len(aceptadas)} comerciales')
+
+    return
+
+
+def main(archivo: str, max_porc_error: float = 0.2, votacion: bool = False, min_porc_votos: float = 0.3,
+         min_confianza: float = None):
+    if votacion:
+        buscar_comerciales_votacion(f'television_cercanos/{archivo}.bin', min_porc_votos)
+    else:
+        buscar_comerciales(f'television_cercanos/{archivo}.bin', max_porc_error, min_confianza=min_confianza)
     return
 
 
@@ -216,4 +546,11 @@ if __name__ == '__main__':
     # máximo porcentaje de errores permitidos
     max_porc_errores = 0.55
 
-    main(video, max_porc_errores)
+    # usar votación de desfases en vez de seguir candidatos, y porcentaje mínimo de votos para una detección
+    usar_votacion = False
+    min_porc_votos = 0.3
+
+    # confianza promedio mínima de una detección (None para no calcular confianza)
+    confianza_minima = None
+
+    main(video, max_porc_errores, usar_votacion, min_porc_votos, confianza_minima)
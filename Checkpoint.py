@@ -0,0 +1,171 @@
+import json
+import os
+from typing import Dict, Optional
+
+
+def huella_archivo(archivo: str) -> Dict:
+    """
+    Identifica la versión de un archivo de entrada por su tamaño y fecha de modificación.
+
+    :param archivo: la ubicación del archivo.
+
+    :return: un diccionario serializable en json.
+    """
+    return {'archivo': archivo, 'tamano': os.path.getsize(archivo), 'modificacion': os.path.getmtime(archivo)}
+
+
+def leer_checkpoint(archivo: str, parametros: Dict) -> Optional[Dict]:
+    """
+    Lee el estado guardado en un archivo de checkpoint. El checkpoint solo se usa si fue guardado con los mismos
+    parámetros (configuración y archivos de entrada), si no se descarta y se debe comenzar desde el principio.
+
+    :param archivo: la ubicación del checkpoint.
+    :param parametros: diccionario serializable en json con los parámetros de la ejecución actual.
+
+    :return: un diccionario con el estado guardado, o None si no existe un checkpoint válido.
+    """
+    if not os.path.isfile(archivo):
+        return None
+
+    with open(archivo, 'r') as checkpoint:
+        estado = json.load(checkpoint)
+
+    # comparar en formato json (las tuplas se guardan como listas)
+    if estado.get('parametros') != json.loads(json.dumps(parametros)):
+        print(f'el checkpoint {archivo} corresponde a otra configuración, se comienza desde el principio')
+        borrar_checkpoint(archivo)
+        return None
+
+    return estado
+
+
+def guardar_checkpoint(archivo: str, estado: Dict):
+    """
+    Guarda un estado en un archivo de checkpoint. Se escribe primero en un archivo temporal y luego se reemplaza el
+    checkpoint, para que una interrupción durante la escritura no deje un checkpoint corrupto.
+
+    :param archivo: la ubicación del checkpoint.
+    :param estado: diccionario serializable en json con el estado a guardar.
+    """
+    temporal = f'{archivo}.tmp'
+    with open(temporal, 'w') as checkpoint:
+        json.dump(estado, checkpoint)
+        checkpoint.flush()
+        os.fsync(checkpoint.fileno())
+
+    os.replace(temporal, archivo)
+    return
+
+
+def borrar_checkpoint(archivo: str):
+    """
+    Borra un archivo de checkpoint, si existe.
+
+    :param archivo: la ubicación del checkpoint.
+    """
+    if os.path.isfile(archivo):
+        os.remove(archivo)
+    return
+
+
+def salidas_validas(offsets: Dict[str, Optional[int]]) -> bool:
+    """
+    Verifica que los archivos de salida de un checkpoint contengan al menos lo escrito según el checkpoint. Si algún
+    archivo no existe o es más corto, el checkpoint no sirve y se debe comenzar desde el principio.
+
+    :param offsets: diccionario con el número de bytes válidos de cada archivo de salida (None si no se escribió).
+
+    :return: si todos los archivos de salida son válidos.
+    """
+    for archivo, offset in offsets.items():
+        if offset is not None and (not os.path.isfile(archivo) or os.path.getsize(archivo) < offset):
+            return False
+
+    return True
+
+
+def abrir_salida(archivo: str, offset: Optional[int], modo: str = 'w'):
+    """
+    Abre un archivo de salida. Si se reanuda desde un checkpoint, se descarta todo lo escrito después del offset
+    guardado y se continúa escribiendo desde ahí, de modo que no queden líneas duplicadas. El archivo nunca se
+    extiende, por lo que antes de reanudar se debe verificar con salidas_validas.
+
+    :param archivo: la ubicación del archivo de salida.
+    :param offset: número de bytes válidos según el checkpoint, None si no se está reanudando.
+    :param modo: modo con el cual abrir el archivo cuando no se está reanudando ('w', 'a', 'wb' o 'ab').
+
+    :return: el archivo abierto.
+    """
+    if offset is None:
+        return open(archivo, modo)
+
+    if not salidas_validas({archivo: offset}):
+        raise Exception(f'el archivo {archivo} no contiene los {offset} bytes guardados en el checkpoint')
+
+    os.truncate(archivo, offset)
+    return open(archivo, 'ab' if 'b' in modo else 'a')
+
+
+def sincronizar(archivo):
+    """
+    Escribe a disco todo lo que está en el buffer de un archivo abierto.
+
+    :param archivo: el archivo abierto.
+
+    :return: el número de bytes escritos en el archivo.
+    """
+    archivo.flush()
+    os.fsync(archivo.fileno())
+    return archivo.tell()
+
+
+def fusionar_salida(parcial: str, destino: str, offset_destino: int):
+    """
+    Agrega el contenido de un archivo parcial al final de un archivo de salida compartido, y borra el parcial. Así cada
+    ejecución solo reescribe su propio archivo parcial y nunca trunca el archivo compartido. Si una fusión anterior se
+    interrumpió, solo se agrega lo que le faltó escribir (incluyendo el resto de una línea a medias).
+
+    :param parcial: la ubicación del archivo parcial.
+    :param destino: la ubicación del archivo compartido.
+    :param offset_destino: tamaño del archivo compartido antes de comenzar la fusión.
+    """
+    with open(parcial, 'rb') as entrada:
+        contenido = entrada.read()
+
+    # lo que una fusión interrumpida alcanzó a escribir después de offset_destino
+    escrito = 0
+    if os.path.isfile(destino):
+        with open(destino, 'rb') as salida:
+            salida.seek(offset_destino)
+            escrito = len(os.path.commonprefix([salida.read(len(contenido)), contenido]))
+
+    with open(destino, 'ab') as salida:
+        salida.write(contenido[escrito:])
+        sincronizar(salida)
+
+    os.remove(parcial)
+    return
+
+
+def fusionar_con_checkpoint(checkpoint: str, estado: Dict, parcial: str, destino: str):
+    """
+    Fusiona un archivo parcial con el archivo compartido (ver fusionar_salida) y borra el checkpoint. Antes de fusionar
+    se guarda en el checkpoint el tamaño del archivo compartido, para que una fusión interrumpida se pueda terminar
+    sin duplicar ni cortar líneas. Si el estado ya corresponde a una fusión y el parcial no existe, la fusión había
+    terminado y solo falta borrar el checkpoint.
+
+    :param checkpoint: la ubicación del checkpoint.
+    :param estado: diccionario serializable en json con el estado a guardar (o el estado leído al reanudar).
+    :param parcial: la ubicación del archivo parcial.
+    :param destino: la ubicación del archivo compartido.
+    """
+    if not estado.get('fusion', False):
+        offset_destino = os.path.getsize(destino) if os.path.isfile(destino) else 0
+        estado = dict(estado, fusion=True, offset_destino=offset_destino)
+        guardar_checkpoint(checkpoint, estado)
+
+    if os.path.isfile(parcial):
+        fusionar_salida(parcial, destino, estado['offset_destino'])
+
+    borrar_checkpoint(checkpoint)
+    return
@@ -1,11 +1,16 @@
+import json
 import os
 import re
 import sys
 import time
-from typing import List
+from typing import List, Tuple
 
+import numpy
 from scipy.spatial import distance
 
+from Checkpoint import leer_checkpoint, guardar_checkpoint, borrar_checkpoint, abrir_salida, sincronizar, \
+    huella_archivo, salidas_validas
+
 
 def distancia_l1(v1: List[int], v2: List[int]) -> float:
     """
@@ -137,16 +142,182 @@ def frames_mas_cercanos_frame(frame: List[int], videos: List[Video], k: int = 5,
     return cercanos
 
 
-def frames_mas_cercanos_video(archivo: str, videos: List[Video], carpeta_log: str, k: int = 5, funcion=distancia_l1):
+def tipo_cercanos(k: int) -> numpy.dtype:
+    """
+    Tipo de cada fila del log binario de frames cercanos: el tiempo del frame y, para cada uno de los k cercanos,
+    el id del comercial (-1 si no hay), el índice del frame en el comercial y la distancia.
+
+    :param k: el número de frames cercanos de cada fila.
+
+    :return: el tipo estructurado de numpy.
+    """
+    return numpy.dtype([('tiempo', '<f8'), ('comercial', '<i4', (k,)), ('indice', '<i4', (k,)),
+                        ('distancia', '<f4', (k,))])
+
+
+# orden de la norma de cada función de distancia, necesario para calcular cotas inferiores en la cascada.
+ORDEN_NORMA = {distancia_l1: 1, distancia_l2: 2}
+
+
+def reducir_caracteristicas(matriz: numpy.ndarray, tamano: Tuple[int, int], tamano_reducido: Tuple[int, int],
+                            orden: int) -> numpy.ndarray:
+    """
+    Reduce la resolución de una matriz de vectores de características sumando bloques de la imagen original.
+    Los bloques se escalan según el orden de la norma para que la distancia entre vectores reducidos sea una cota
+    inferior de la distancia entre los vectores originales (desigualdad triangular para L1, Cauchy-Schwarz para L2).
+
+    :param matriz: matriz de n x (alto * ancho), un vector de características por fila.
+    :param tamano: el tamaño (alto, ancho) de la imagen representada por cada vector.
+    :param tamano_reducido: el tamaño (alto, ancho) al cual reducir cada vector.
+    :param orden: orden de la norma de la distancia utilizada (1 o 2).
+
+    :return: una matriz de n x (alto_reducido * ancho_reducido).
+    """
+    alto, ancho = tamano
+    filas = numpy.array_split(numpy.arange(alto), tamano_reducido[0])
+    columnas = numpy.array_split(numpy.arange(ancho), tamano_reducido[1])
+
+    # sumar bloques de filas y luego de columnas.
+    imagenes = matriz.reshape(-1, alto, ancho).astype(numpy.float64)
+    bloques = numpy.add.reduceat(imagenes, [f[0] for f in filas], axis=1)
+    bloques = numpy.add.reduceat(bloques, [c[0] for c in columnas], axis=2)
+
+    if orden == 2:
+        area = numpy.outer([len(f) for f in filas], [len(c) for c in columnas])
+        bloques /= numpy.sqrt(area)
+
+    return bloques.reshape(len(matriz), -1)
+
+
+class Catalogo:
+    def __init__(self, videos: List[Video], niveles: List[Tuple[int, int]], orden: int, tamano: Tuple[int, int]):
+        """
+        Agrupa los frames de una lista de Videos en matrices, con una matriz reducida por cada nivel de la cascada.
+
+        :param videos: una lista de Videos.
+        :param niveles: lista de tamaños (alto, ancho) de cada nivel de la cascada, de menor a mayor.
+        :param orden: orden de la norma de la distancia utilizada (1 o 2).
+        :param tamano: el tamaño (alto, ancho) de la imagen representada por cada vector de características.
+        """
+        for nivel in niveles:
+            if not (1 <= nivel[0] <= tamano[0] and 1 <= nivel[1] <= tamano[1]):
+                raise Exception(f'el nivel {nivel} de la cascada debe estar entre (1, 1) y el tamaño {tamano}')
+
+        self.videos = videos
+        self.orden = orden
+        self.frames = [frame for video in videos for frame in video.frames]
+        self.tamanos_niveles = niveles
+        self.nombres = [video.nombre for video in videos for _ in video.frames]
+        self.indices = [i for video in videos for i in range(len(video.frames))]
+
+        matriz = numpy.array(self.frames)
+        if matriz.shape[1] != tamano[0] * tamano[1]:
+            raise Exception(f'los vectores tienen {matriz.shape[1]} características, '
+                            f'no corresponden al tamaño {tamano}')
+
+        self.tamano = tamano
+        self.niveles = [reducir_caracteristicas(matriz, self.tamano, nivel, orden) for nivel in niveles]
+
+        # estadísticas de poda
+        self.calculadas = 0
+        self.total = 0
+
+
+def cota_inferior(catalogo: Catalogo, nivel: int, vector: numpy.ndarray, filas: numpy.ndarray) -> numpy.ndarray:
+    """
+    Calcula la cota inferior de la distancia entre un vector reducido y las filas indicadas de un nivel del catálogo.
+
+    :param catalogo: el Catalogo en el cual buscar.
+    :param nivel: el nivel de la cascada a utilizar.
+    :param vector: el vector ya reducido al tamaño del nivel.
+    :param filas: índices de las filas del catálogo a comparar.
+
+    :return: un arreglo con la cota inferior para cada fila.
+    """
+    diferencia = catalogo.niveles[nivel][filas] - vector
+    if catalogo.orden == 1:
+        return numpy.abs(diferencia).sum(axis=1)
+    return numpy.sqrt((diferencia ** 2).sum(axis=1))
+
+
+def frames_mas_cercanos_cascada(frame: List[int], catalogo: Catalogo, k: int = 5, funcion=distancia_l1) -> List[Frame]:
+    """
+    Encuentra los k frames más cercanos al frame dado usando una cascada de resoluciones: primero se filtra todo el
+    catálogo con la cota inferior de menor resolución y solo los frames sobrevivientes se comparan a mayor resolución.
+    El resultado es idéntico al de frames_mas_cercanos_frame, ya que ningún frame descartado puede estar entre los k
+    más cercanos.
+
+    :param frame: el frame del cuál buscar frames cercanos.
+    :param catalogo: el Catalogo en el cual buscar frames cercanos.
+    :param k: el número de frames cercanos a buscar.
+    :param funcion: la función para calcular la distancia entre 2 vectores de ints.
+
+    :return: una lista de Frames.
+    """
+    vector = numpy.array(frame).reshape(1, -1)
+    filas = numpy.arange(len(catalogo.frames))
+    umbral = numpy.inf
+
+    # distancias reales ya calculadas, para no repetirlas en niveles posteriores ni al refinar
+    conocidas = {}
+
+    def distancia(j: int) -> float:
+        if j not in conocidas:
+            conocidas[j] = funcion(frame, catalogo.frames[j])
+            catalogo.calculadas += 1
+        return conocidas[j]
+
+    for nivel, tamano in enumerate(catalogo.tamanos_niveles):
+        reducido = reducir_caracteristicas(vector, catalogo.tamano, tamano, catalogo.orden)
+        cotas = cota_inferior(catalogo, nivel, reducido[0], filas)
+
+        # acotar la k-ésima distancia con la distancia real de los k frames de menor cota.
+        mejores = filas[numpy.argsort(cotas, kind='stable')[:k]]
+        distancias = sorted(distancia(j) for j in mejores)
+        if len(distancias) == k:
+            umbral = min(umbral, distancias[-1])
+
+        # descartar frames cuya cota supera la k-ésima distancia (con holgura por redondeo).
+        filas = filas[cotas <= umbral * (1 + 1e-9) + 1e-9]
+
+    # calcular distancia real de los sobrevivientes en el orden original, para conservar el desempate.
+    distancia_inf = Frame('', -1, 1000000000)
+    cercanos = [distancia_inf for _ in range(k)]
+    for j in filas:
+        insertar_min_frame(cercanos, Frame(catalogo.nombres[j], catalogo.indices[j], distancia(j)))
+
+    catalogo.total += len(catalogo.frames)
+
+    return cercanos
+
+
+def frames_mas_cercanos_video(archivo: str, videos: List[Video], carpeta_log: str, k: int = 5, funcion=distancia_l1,
+                              niveles_cascada: List[Tuple[int, int]] = None, umbral_duplicados: float = 0,
+                              tamano_bloque: int = 500, exportar_texto: bool = False, tamano: Tuple[int, int] = None):
     """
     Encuentra los k frames más cercanos a cada frame del video dado, dentro de todos los frames en una lista de Videos,
-    registra esta información en un log txt.
+    registra esta información en un log binario (ver tipo_cercanos), con los nombres de los comerciales en un archivo
+    json del mismo nombre. Opcionalmente también se exporta un log txt legible, útil para depurar.
+
+    Opcionalmente, los frames consecutivos casi idénticos (escenas estáticas, negro, paneos lentos) reutilizan los
+    cercanos del último frame buscado (el representante), de modo que el log mantiene una línea por frame.
+
+    Los frames se procesan en bloques, guardando un checkpoint al final de cada uno. Si el proceso se interrumpe, al
+    volver a ejecutarlo se reanuda desde el último checkpoint y el log queda idéntico al de una ejecución completa.
 
     :param archivo: el archivo del cuál buscar frames cercanos.
     :param videos: una lista de Videos en los cuáles buscar frames cercanos.
     :param carpeta_log: la carpeta en la cual guardar el log.
     :param k: el número de frames cercanos a buscar.
     :param funcion: la función para calcular la distancia entre 2 vectores de ints.
+    :param niveles_cascada: tamaños de los niveles de la cascada de resoluciones (e.g. [(4, 4), (8, 8)]),
+        None para comparar todos los frames a resolución completa.
+    :param umbral_duplicados: distancia máxima (según funcion) entre un frame y su representante para considerarlo
+        duplicado, 0 para buscar todos los frames.
+    :param tamano_bloque: número de frames procesados entre cada escritura y checkpoint.
+    :param exportar_texto: si se exporta además el log en formato txt.
+    :param tamano: el tamaño (alto, ancho) usado al extraer las características, necesario para la cascada. Si es
+        None se infiere cuando el número de características es un cuadrado, si no se busca sin cascada.
     """
 
     # medir tiempo
@@ -155,42 +326,149 @@ def frames_mas_cercanos_video(archivo: str, videos: List[Video], carpeta_log: st
     # leer caracteristicas del video
     video = leer_video(archivo)
 
-    # abrir log
+    # preparar cascada (solo para distancias con cota inferior conocida)
+    catalogo = None
+    if niveles_cascada and funcion in ORDEN_NORMA:
+        # si no se indica el tamaño, se asume cuadrado (como en Extraccion.py)
+        if tamano is None and len(video.frames) > 0:
+            lado = int(round(numpy.sqrt(len(video.frames[0]))))
+            if lado * lado == len(video.frames[0]):
+                tamano = (lado, lado)
+
+        if tamano is None:
+            print('no se conoce el tamaño usado al extraer las características, se busca sin cascada')
+        else:
+            catalogo = Catalogo(videos, niveles_cascada, ORDEN_NORMA[funcion], tamano)
+
+    # abrir logs
     nombre = re.split('[/.]', archivo)[-2]
     if not os.path.isdir(carpeta_log):
         os.mkdir(carpeta_log)
-    log = open(f'{carpeta_log}/{nombre}.txt', 'w')
+    ruta_bin = f'{carpeta_log}/{nombre}.bin'
+    ruta_txt = f'{carpeta_log}/{nombre}.txt'
+    rutas = [ruta_bin, ruta_txt] if exportar_texto else [ruta_bin]
+
+    # reanudar desde el último checkpoint, si existe
+    ruta_checkpoint = f'{carpeta_log}/{nombre}.distancia.checkpoint'
+    parametros = {'entrada': huella_archivo(archivo), 'k': k, 'funcion': funcion.__name__,
+                  'niveles_cascada': niveles_cascada, 'tamano': tamano, 'umbral_duplicados': umbral_duplicados,
+                  'tamano_bloque': tamano_bloque, 'comerciales': [[v.nombre, len(v.frames)] for v in videos]}
+    estado = leer_checkpoint(ruta_checkpoint, parametros)
+
+    # si el checkpoint no exportaba texto, el txt no tiene los frames anteriores y hay que comenzar de nuevo
+    if estado is not None and exportar_texto and ruta_txt not in estado['offsets']:
+        print('el checkpoint no exporta texto, se comienza desde el principio')
+        estado = None
+
+    # si los logs no contienen lo guardado en el checkpoint también hay que comenzar de nuevo
+    if estado is not None and not salidas_validas(estado['offsets']):
+        print('los logs no corresponden al checkpoint, se comienza desde el principio')
+        estado = None
+
+    if estado is None:
+        estado = {'frame': 0, 'offsets': {ruta: None for ruta in rutas}, 'duplicados': 0}
+
+        # cabecera con los nombres de los comerciales, los frames guardan el id de su comercial
+        with open(f'{carpeta_log}/{nombre}.json', 'w') as cabecera:
+            json.dump({'k': k, 'comerciales': [video.nombre for video in videos]}, cabecera)
+    else:
+        print(f'reanudando desde el frame {estado["frame"]}')
+
+    ids = {video.nombre: i for i, video in enumerate(videos)}
+
+    log_bin = abrir_salida(ruta_bin, estado['offsets'][ruta_bin], 'wb')
+    log_txt = abrir_salida(ruta_txt, estado['offsets'][ruta_txt]) if exportar_texto else None
 
     print(f'buscando {k} frames más cercanos para {nombre}')
 
-    # buscar los frames más cercanos de cada frame
-    for i in range(len(video.frames)):
-        cercanos = frames_mas_cercanos_frame(video.frames[i], videos, k=k, funcion=funcion)
-        cercanos_str = ' | '.join([f'{frame.comercial} # {frame.indice}' for frame in cercanos])
+    # los resultados se acumulan en un bloque y se escriben todos juntos
+    bloque = numpy.zeros(tamano_bloque, dtype=tipo_cercanos(k))
+    lineas = []
+    llenos = 0
 
-        # registrar resultado
-        log.write(f'{video.tiempo[i]} $ {cercanos_str}\n')
+    # último frame buscado y sus cercanos, para reutilizar en duplicados
+    representante = None
+    fila = None
+    cercanos_str = ''
+    duplicados = estado['duplicados']
 
-        if i % 500 == 0 and i != 0:
-            print(f'progreso: {i} frames, {int(time.time() - t0)} segundos')
+    # buscar los frames más cercanos de cada frame
+    for i in range(estado['frame'], len(video.frames)):
+
+        # cada bloque comienza sin representante, para que reanudar no cambie el resultado
+        if i % tamano_bloque == 0:
+            representante = None
+
+        # reutilizar cercanos si el frame es casi idéntico al representante
+        if representante is not None and funcion(video.frames[i], representante) <= umbral_duplicados:
+            duplicados += 1
+
+        else:
+            if catalogo is None:
+                cercanos = frames_mas_cercanos_frame(video.frames[i], videos, k=k, funcion=funcion)
+            else:
+                cercanos = frames_mas_cercanos_cascada(video.frames[i], catalogo, k=k, funcion=funcion)
+            fila = ([ids.get(frame.comercial, -1) for frame in cercanos], [frame.indice for frame in cercanos],
+                    [frame.distancia for frame in cercanos])
+            if exportar_texto:
+                cercanos_str = ' | '.join([f'{frame.comercial} # {frame.indice} # {frame.distancia}'
+                                           for frame in cercanos])
+
+            if umbral_duplicados > 0:
+                representante = video.frames[i]
 
-    log.close()
+        # registrar resultado
+        bloque[llenos] = (video.tiempo[i],) + fila
+        llenos += 1
+        if exportar_texto:
+            lineas.append(f'{video.tiempo[i]} $ {cercanos_str}\n')
+
+        # escribir bloque y guardar checkpoint al final de cada bloque
+        if (i + 1) % tamano_bloque == 0 or i + 1 == len(video.frames):
+            bloque[:llenos].tofile(log_bin)
+            offsets = {ruta_bin: sincronizar(log_bin)}
+            if exportar_texto:
+                log_txt.write(''.join(lineas))
+                offsets[ruta_txt] = sincronizar(log_txt)
+            lineas = []
+            llenos = 0
+
+            guardar_checkpoint(ruta_checkpoint, {'frame': i + 1, 'offsets': offsets, 'duplicados': duplicados,
+                                                 'parametros': parametros})
+            print(f'progreso: {i + 1} frames, {int(time.time() - t0)} segundos')
+
+    log_bin.close()
+    if exportar_texto:
+        log_txt.close()
+    borrar_checkpoint(ruta_checkpoint)
     print(f'la búsqueda de {k} frames más cercanos tomó {int(time.time() - t0)} segundos')
+    if umbral_duplicados > 0:
+        print(f'se omitieron {duplicados} de {len(video.frames)} búsquedas por frames duplicados')
+    if catalogo is not None and catalogo.total > 0:
+        print(f'la cascada calculó {catalogo.calculadas} de {catalogo.total} distancias completas '
+              f'(poda de {"%.1f" % (100 * (1 - catalogo.calculadas / catalogo.total))}%)')
     return
 
 
-def main(archivo: str, k: int, funcion):
+def main(archivo: str, k: int, funcion, niveles_cascada: List[Tuple[int, int]] = None, umbral_duplicados: float = 0,
+         exportar_texto: bool = False, tamano: Tuple[int, int] = None):
     """
     Encuentra los k frames más cercanos a cada frame del video dado, dentro de todos los frames en una lista de Videos,
-    registra esta información en un log txt en la carpeta television_cercanos/.
+    registra esta información en un log binario en la carpeta television_cercanos/.
 
     :param archivo: el nombre del video de television del cuál buscar frames cercanos.
     :param k: el número de frames cercanos a buscar.
     :param funcion: la función para calcular la distancia entre 2 vectores de ints.
+    :param niveles_cascada: tamaños de los niveles de la cascada de resoluciones, None para desactivarla.
+    :param umbral_duplicados: distancia máxima para reutilizar los cercanos de un frame anterior, 0 para desactivarlo.
+    :param exportar_texto: si se exporta además el log en formato txt.
+    :param tamano: el tamaño (alto, ancho) usado al extraer las características, necesario para la cascada. Si es
+        None se infiere cuando el número de características es un cuadrado, si no se busca sin cascada.
     """
 
     comerciales = leer_videos('comerciales_car')
-    frames_mas_cercanos_video(f'television_car/{archivo}.txt', comerciales, 'television_cercanos', k, funcion)
+    frames_mas_cercanos_video(f'television_car/{archivo}.txt', comerciales, 'television_cercanos', k, funcion,
+                              niveles_cascada, umbral_duplicados, exportar_texto=exportar_texto, tamano=tamano)
     return
 
 
@@ -211,4 +489,16 @@ if __name__ == '__main__':
     # funcion de distancia a utilizar
     funcion_de_distancia = distancia_l2
 
-    main(nombre_video, numero_de_cercanos, funcion_de_distancia)
+    # niveles de la cascada de resoluciones (None para buscar a resolución completa)
+    cascada = [(4, 4), (8, 8)]
+
+    # distancia máxima entre frames consecutivos para reutilizar sus cercanos (0 para buscar todos los frames)
+    umbral = 0
+
+    # exportar también los frames cercanos en formato txt (para depurar)
+    exportar_txt = False
+
+    # tamaño de los vectores de características (el mismo usado en Extraccion.py, None para inferirlo)
+    tamano_vector = None
+
+    main(nombre_video, numero_de_cercanos, funcion_de_distancia, cascada, umbral, exportar_txt, tamano_vector)
@@ -3,7 +3,7 @@ import time
 
 from Extraccion import caracteristicas_videos, caracteristicas_video
 from Distancia import leer_videos, frames_mas_cercanos_video, distancia_l1
-from Busqueda import buscar_comerciales
+from Busqueda import buscar_comerciales, buscar_comerciales_votacion
 
 
 def main(nombre_video: str):
@@ -19,13 +19,22 @@ def main(nombre_video: str):
     # buscar frames cercanos
     frames_cercanos = 10
     funcion_distancia = distancia_l1
+    niveles_cascada = [(4, 4), (8, 8)]
+    umbral_duplicados = 0  # distancia máxima para reutilizar cercanos (0 para buscar todos los frames)
     comerciales = leer_videos('comerciales_car')
     frames_mas_cercanos_video(f'television_car/{nombre_video}.txt', comerciales, 'television_cercanos',
-                              k=frames_cercanos, funcion=funcion_distancia)
+                              k=frames_cercanos, funcion=funcion_distancia, niveles_cascada=niveles_cascada,
+                              umbral_duplicados=umbral_duplicados, tamano=tamano)
 
     # buscar comerciales
     max_porc_errores = 0.55
-    buscar_comerciales(f'television_cercanos/{nombre_video}.txt', max_porc_errores)
+    usar_votacion = False
+    min_porc_votos = 0.3
+    min_confianza = None
+    if usar_votacion:
+        buscar_comerciales_votacion(f'television_cercanos/{nombre_video}.bin', min_porc_votos)
+    else:
+        buscar_comerciales(f'television_cercanos/{nombre_video}.bin', max_porc_errores, min_confianza=min_confianza)
 
     print(f'el proceso tomó {int(time.time() - t)} segundos')
     return
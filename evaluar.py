@@ -12,8 +12,9 @@ def get_videoname(filepath):
 class Deteccion:
     def __init__(self, num_linea, linea):
         partes = linea.split("\t")
-        if len(partes) != 4:
-            raise Exception("formato incorrecto (debe ser 4 columnas separadas por tab)")
+        # una quinta columna opcional con la confianza de la deteccion se ignora
+        if len(partes) != 4 and len(partes) != 5:
+            raise Exception("formato incorrecto (debe ser 4 columnas separadas por tab, mas una confianza opcional)")
         television = get_videoname(partes[0])
         # los tiempos pueden ser con milisegundos
         desde = round(float(partes[1]), 3)
@@ -0,0 +1,188 @@
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import numpy
+import pytest
+
+CARPETA_REPO = os.path.dirname(os.path.abspath(__file__))
+
+DISTANCIA = """
+from Distancia import leer_videos, frames_mas_cercanos_video, distancia_l1
+comerciales = leer_videos('comerciales_car')
+frames_mas_cercanos_video('television_car/tv.txt', comerciales, '{carpeta}', k=5, funcion=distancia_l1,
+                          tamano_bloque=10, exportar_texto=True)
+"""
+
+BUSQUEDA = """
+import os
+import Busqueda
+
+# simular una caída después de procesar {maximo} frames
+llamadas = [0]
+buscar_frame = Busqueda.buscar_frame
+def buscar_frame_con_caida(*args, **kwargs):
+    llamadas[0] += 1
+    if {maximo} and llamadas[0] == {maximo}:
+        os._exit(3)
+    return buscar_frame(*args, **kwargs)
+Busqueda.buscar_frame = buscar_frame_con_caida
+{fusion}
+Busqueda.buscar_comerciales('{archivo}', 0.55, tamano_bloque=20)
+"""
+
+# simular una caída al agregar el parcial a respuesta.txt, dejando una línea a medias
+CAIDA_DURANTE_FUSION = """
+import Checkpoint
+def fusionar_con_caida(parcial, destino, offset_destino):
+    with open(parcial, 'rb') as entrada:
+        contenido = entrada.read()
+    with open(destino, 'ab') as salida:
+        salida.write(contenido[:len(contenido) // 2 + 3])
+    os._exit(3)
+Checkpoint.fusionar_salida = fusionar_con_caida
+"""
+
+# simular una caída después de agregar el parcial a respuesta.txt, antes de borrar el checkpoint
+CAIDA_DESPUES_DE_FUSION = """
+import Checkpoint
+def borrar_con_caida(archivo):
+    os._exit(3)
+Checkpoint.borrar_checkpoint = borrar_con_caida
+"""
+
+
+def escribir_caracteristicas(archivo: str, frames: numpy.ndarray):
+    with open(archivo, 'w') as log:
+        for i, frame in enumerate(frames):
+            log.write('{} {}\n'.format('%.3f' % (0.2 * i), ' '.join(frame.astype(str))))
+
+
+def crear_datos(carpeta: str):
+    """
+    Crea comerciales y un video de televisión sintéticos, con los comerciales insertados en la televisión.
+    """
+    generador = numpy.random.RandomState(0)
+    os.mkdir(os.path.join(carpeta, 'comerciales_car'))
+    os.mkdir(os.path.join(carpeta, 'television_car'))
+
+    comerciales = []
+    for n in range(6):
+        frames = numpy.cumsum(generador.randint(-10, 11, size=(50, 100)), axis=0) + generador.randint(0, 255, 100)
+        comerciales.append(frames)
+        escribir_caracteristicas(os.path.join(carpeta, 'comerciales_car', f'comercial{n}.txt'), frames)
+
+    partes = []
+    for comercial in comerciales * 3:
+        partes.append(generador.randint(0, 255, size=(40, 100)))
+        partes.append(comercial + generador.randint(-2, 3, size=comercial.shape))
+    escribir_caracteristicas(os.path.join(carpeta, 'television_car', 'tv.txt'), numpy.concatenate(partes))
+
+
+def ejecutar(codigo: str, carpeta: str) -> subprocess.Popen:
+    entorno = dict(os.environ, PYTHONPATH=CARPETA_REPO)
+    return subprocess.Popen([sys.executable, '-c', codigo], cwd=carpeta, env=entorno,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def leer_bytes(archivo: str) -> bytes:
+    with open(archivo, 'rb') as log:
+        return log.read()
+
+
+def test_distancia_reanuda_despues_de_matar_el_proceso(tmp_path):
+    carpeta = str(tmp_path)
+    crear_datos(carpeta)
+
+    # ejecución completa de referencia
+    assert ejecutar(DISTANCIA.format(carpeta='completo'), carpeta).wait() == 0
+
+    # matar el proceso después del primer checkpoint
+    checkpoint = os.path.join(carpeta, 'interrumpido', 'tv.distancia.checkpoint')
+    proceso = ejecutar(DISTANCIA.format(carpeta='interrumpido'), carpeta)
+    while not os.path.isfile(checkpoint) and proceso.poll() is None:
+        time.sleep(0.005)
+    proceso.send_signal(signal.SIGKILL)
+    proceso.wait()
+    assert os.path.isfile(checkpoint), 'el proceso terminó antes de ser interrumpido'
+
+    # reanudar y comparar
+    assert ejecutar(DISTANCIA.format(carpeta='interrumpido'), carpeta).wait() == 0
+    assert not os.path.isfile(checkpoint)
+    for extension in ['bin', 'txt', 'json']:
+        assert leer_bytes(os.path.join(carpeta, 'completo', f'tv.{extension}')) == \
+            leer_bytes(os.path.join(carpeta, 'interrumpido', f'tv.{extension}'))
+
+
+def test_distancia_comienza_de_nuevo_si_falta_el_log(tmp_path):
+    carpeta = str(tmp_path)
+    crear_datos(carpeta)
+    assert ejecutar(DISTANCIA.format(carpeta='completo'), carpeta).wait() == 0
+
+    # matar el proceso después del primer checkpoint y borrar el log binario
+    checkpoint = os.path.join(carpeta, 'interrumpido', 'tv.distancia.checkpoint')
+    proceso = ejecutar(DISTANCIA.format(carpeta='interrumpido'), carpeta)
+    while not os.path.isfile(checkpoint) and proceso.poll() is None:
+        time.sleep(0.005)
+    proceso.send_signal(signal.SIGKILL)
+    proceso.wait()
+    assert os.path.isfile(checkpoint), 'el proceso terminó antes de ser interrumpido'
+    os.remove(os.path.join(carpeta, 'interrumpido', 'tv.bin'))
+
+    # el checkpoint se descarta y el log queda igual al de una ejecución completa (sin bytes de relleno)
+    assert ejecutar(DISTANCIA.format(carpeta='interrumpido'), carpeta).wait() == 0
+    for extension in ['bin', 'txt', 'json']:
+        assert leer_bytes(os.path.join(carpeta, 'completo', f'tv.{extension}')) == \
+            leer_bytes(os.path.join(carpeta, 'interrumpido', f'tv.{extension}'))
+
+
+def test_busqueda_reanuda_sin_borrar_otras_detecciones(tmp_path):
+    carpeta = str(tmp_path)
+    crear_datos(carpeta)
+    assert ejecutar(DISTANCIA.format(carpeta='television_cercanos'), carpeta).wait() == 0
+    respuesta = os.path.join(carpeta, 'respuesta.txt')
+
+    # ejecución completa de referencia
+    assert ejecutar(BUSQUEDA.format(archivo='television_cercanos/tv.bin', maximo=0, fusion=''), carpeta).wait() == 0
+    detecciones = leer_bytes(respuesta)
+    assert len(detecciones) > 0
+    os.remove(respuesta)
+
+    # caída a mitad de la búsqueda, luego otro video agrega una detección a respuesta.txt
+    assert ejecutar(BUSQUEDA.format(archivo='television_cercanos/tv.bin', maximo=6000, fusion=''), carpeta).wait() == 3
+    assert os.path.isfile(os.path.join(carpeta, 'television_cercanos', 'tv.busqueda.checkpoint'))
+    assert os.path.getsize(os.path.join(carpeta, 'television_cercanos', 'tv.respuesta.parcial')) > 0
+    otra = b'otro_video\t10.0\t20.0\tcomercial0\n'
+    with open(respuesta, 'ab') as log:
+        log.write(otra)
+
+    # reanudar: la detección del otro video se mantiene y no hay duplicados
+    assert ejecutar(BUSQUEDA.format(archivo='television_cercanos/tv.bin', maximo=0, fusion=''), carpeta).wait() == 0
+    assert leer_bytes(respuesta) == otra + detecciones
+
+
+@pytest.mark.parametrize('caida', [CAIDA_DURANTE_FUSION, CAIDA_DESPUES_DE_FUSION])
+def test_busqueda_termina_fusion_interrumpida(tmp_path, caida):
+    carpeta = str(tmp_path)
+    crear_datos(carpeta)
+    assert ejecutar(DISTANCIA.format(carpeta='television_cercanos'), carpeta).wait() == 0
+    respuesta = os.path.join(carpeta, 'respuesta.txt')
+
+    # ejecución completa de referencia
+    assert ejecutar(BUSQUEDA.format(archivo='television_cercanos/tv.bin', maximo=0, fusion=''), carpeta).wait() == 0
+    detecciones = leer_bytes(respuesta)
+    otra = b'otro_video\t10.0\t20.0\tcomercial0\n'
+    with open(respuesta, 'wb') as log:
+        log.write(otra)
+
+    # caída al agregar las detecciones a respuesta.txt
+    assert ejecutar(BUSQUEDA.format(archivo='television_cercanos/tv.bin', maximo=0, fusion=caida), carpeta).wait() == 3
+    assert os.path.isfile(os.path.join(carpeta, 'television_cercanos', 'tv.busqueda.checkpoint'))
+
+    # reanudar: se completa la línea a medias, sin duplicar ni buscar de nuevo
+    assert ejecutar(BUSQUEDA.format(archivo='television_cercanos/tv.bin', maximo=1, fusion=''), carpeta).wait() == 0
+    assert leer_bytes(respuesta) == otra + detecciones
+    assert not os.path.isfile(os.path.join(carpeta, 'television_cercanos', 'tv.busqueda.checkpoint'))
+    assert not os.path.isfile(os.path.join(carpeta, 'television_cercanos', 'tv.respuesta.parcial'))